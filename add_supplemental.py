@@ -6,8 +6,12 @@ Handles replacements (original_cin, imdb) and new additions (comedy_history_101,
 import os
 import re
 import logging
+from collections import deque
+from collections.abc import Iterator
 import chromadb
 
+from embeddings import embed_texts
+
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -19,6 +23,10 @@ COLLECTION_NAME = "kenny_robinson"
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 50
 
+BATCH_SIZE = 250  # chunks per collection.add call
+
+_WORD_RE = re.compile(r"\S+")
+
 # filename -> (source_name, replaces_existing_source_name_or_None)
 FILES = {
     "comedy_history_101.txt": ("comedy_history_101", None),           # new — previously failed fetch
@@ -30,47 +38,60 @@ FILES = {
 
 def parse_file(filepath: str) -> tuple[str, str]:
     """Read a supplemental file and extract its URL + body text.
+    Only the header block is scanned line by line; the body is read in one go after it.
     Returns (source_url, body_text).
     """
-    with open(filepath, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
     source_url = ""
-    body_start = 0
-
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        if stripped.upper().startswith("URL:"):
-            source_url = stripped.split(":", 1)[1].strip()
-        # Body starts after the first blank line following the header block
-        if stripped == "" and i > 0:
-            body_start = i + 1
-            break
-
-    body = "".join(lines[body_start:]).strip()
-    return source_url, body
-
-
-def chunk_text(text: str) -> list[str]:
-    """Split text into chunks of ~CHUNK_SIZE tokens with ~CHUNK_OVERLAP token overlap."""
-    words = text.split()
-    if not words:
-        return []
+    header_lines = []
+    body = None
 
+    with open(filepath, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            stripped = line.strip()
+            if stripped.upper().startswith("URL:"):
+                source_url = stripped.split(":", 1)[1].strip()
+            # Body starts after the first blank line following the header block
+            if stripped == "" and i > 0:
+                body = f.read()
+                break
+            header_lines.append(line)
+
+    if body is None:
+        # No header block: the whole file is body
+        body = "".join(header_lines)
+    return source_url, body.strip()
+
+
+def iter_chunks(text: str) -> Iterator[str]:
+    """Yield chunks of ~CHUNK_SIZE tokens with ~CHUNK_OVERLAP token overlap.
+    Words are streamed through a fixed-size window; a chunk is emitted every
+    (window - overlap) words, plus one final partial window for any words left over.
+    """
     words_per_chunk = int(CHUNK_SIZE / 1.33)
     words_overlap = int(CHUNK_OVERLAP / 1.33)
+    stride = words_per_chunk - words_overlap
+
+    window = deque(maxlen=words_per_chunk)
+    count = 0
+    emitted = 0                 # words covered by the windows yielded so far
+    next_end = words_per_chunk  # word count at which the next full window is due
+    for match in _WORD_RE.finditer(text):
+        window.append(match.group())
+        count += 1
+        if count == next_end:
+            yield " ".join(window)
+            emitted = count
+            next_end += stride
+
+    if count > emitted:
+        # Final partial window, starting where the next full window would have
+        tail = count - max(emitted - words_overlap, 0)
+        yield " ".join(list(window)[-tail:])
 
-    chunks = []
-    start = 0
-    while start < len(words):
-        end = start + words_per_chunk
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        start = end - words_overlap
-        if start >= len(words):
-            break
 
-    return chunks
+def chunk_text(text: str) -> list[str]:
+    """Split text into chunks of ~CHUNK_SIZE tokens with ~CHUNK_OVERLAP token overlap."""
+    return list(iter_chunks(text))
 
 
 def main():
@@ -80,13 +101,14 @@ def main():
     count_before = collection.count()
     logger.info(f"Opened collection '{COLLECTION_NAME}' — {count_before} existing documents")
 
-    # Gather IDs of sources being replaced
-    existing = collection.get(include=["metadatas"])
-    sources_to_replace = {v[1] for v in FILES.values() if v[1] is not None}
-    ids_to_delete = [
-        id for id, m in zip(existing["ids"], existing["metadatas"])
-        if m["source_name"] in sources_to_replace
-    ]
+    # Gather IDs of sources being replaced (filtered by ChromaDB; only ids come back)
+    sources_to_replace = frozenset(v[1] for v in FILES.values() if v[1] is not None)
+    ids_to_delete = []
+    if sources_to_replace:
+        ids_to_delete = collection.get(
+            where={"source_name": {"$in": sorted(sources_to_replace)}},
+            include=[],
+        )["ids"]
 
     if ids_to_delete:
         logger.info(f"Deleting {len(ids_to_delete)} old chunks for replaced sources: {sorted(sources_to_replace)}")
@@ -116,7 +138,14 @@ def main():
             for i in range(len(chunks))
         ]
 
-        collection.add(ids=ids, documents=chunks, metadatas=metadatas)
+        embeddings = embed_texts(chunks)
+        for i in range(0, len(chunks), BATCH_SIZE):
+            collection.add(
+                ids=ids[i : i + BATCH_SIZE],
+                embeddings=embeddings[i : i + BATCH_SIZE],
+                documents=chunks[i : i + BATCH_SIZE],
+                metadatas=metadatas[i : i + BATCH_SIZE],
+            )
         total_added += len(chunks)
         logger.info(f"  {filename} -> {source_name}: {len(chunks)} chunks added ({len(body):,} chars)")
 
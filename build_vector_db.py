@@ -5,12 +5,19 @@ Fetches articles, saves raw text, chunks, and indexes into ChromaDB.
 
 import os
 import re
-import time
+import asyncio
 import logging
-import requests
-from bs4 import BeautifulSoup, Comment
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import httpx
+from selectolax.lexbor import LexborHTMLParser, LexborNode
 import chromadb
 
+from embeddings import embed_texts
+
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -24,6 +31,21 @@ COLLECTION_NAME = "kenny_robinson"
 CHUNK_SIZE = 500       # approximate tokens per chunk
 CHUNK_OVERLAP = 50     # approximate token overlap
 
+HOST_CONCURRENCY = 4   # max in-flight requests per host
+POLITE_DELAY = 1.0     # seconds each request slot is held after a fetch
+
+BATCH_SIZE = 250       # chunks per collection.add call
+INSERT_WORKERS = 2     # concurrent collection.add calls
+# HNSW index settings, fixed when the collection is created. Vectors are normalized, so cosine
+# ranks like the old l2 default; M/construction_ef buy recall at build time, search_ef at
+# query time is plenty for a top-10 candidate fetch.
+HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64,
+}
+
 HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -63,131 +85,233 @@ STRIP_TAGS = [
 ]
 
 
-def _clean_soup(soup: BeautifulSoup) -> BeautifulSoup:
-    """Remove boilerplate tags and comments from soup."""
-    # Remove comments
-    for comment in soup.find_all(string=lambda t: isinstance(t, Comment)):
-        comment.extract()
-    # Remove unwanted tags
-    for tag_name in STRIP_TAGS:
-        for tag in soup.find_all(tag_name):
-            tag.decompose()
-    return soup
+TEXT_TAGS = frozenset({
+    "p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "td", "dd", "dt", "span", "div",
+})
+
+# Main-content containers, in priority order (first selector that matches wins)
+MAIN_SELECTORS = [
+    # Squarespace-based sites (original-cin, comedygreenroom, comedyhistory101, partonandpearl)
+    "div.sqs-block-content",
+    "div.blog-item-content",
+    # Generic article/main patterns
+    "article",
+    "main",
+    'div[role="main"]',
+    "div.article-body", "div.article_body", "div.article-content", "div.article_content",
+    "div.post-content", "div.post_content", "div.entry-content", "div.entry_content",
+    "div.story-body", "div.story_body",
+    "div#article", "div#content", "div#post", "div#entry", "div#story",
+    "div.article", "div.content", "div.post", "div.entry", "div.story",
+]
+
+# Whitespace cleanup patterns, compiled once
+_NEWLINE_RE = re.compile(r"\n{3,}")
+_WS_RE = re.compile(r"[ \t]+")
+
+
+def _clean_tree(tree: LexborHTMLParser) -> LexborHTMLParser:
+    """Remove boilerplate tags from the parse tree (comments never appear in node text)."""
+    tree.strip_tags(STRIP_TAGS)
+    return tree
 
 
-def _get_text_from_container(container) -> str:
+def _collect_text_blocks(container: LexborNode) -> list[str]:
+    """Walk the container top-down and return the text of the outermost text elements.
+    Descendants of an element that was kept are skipped (their text is already included),
+    and repeated blocks are dropped by their whitespace-normalized text.
+    """
+    lines = []
+    seen = set()
+    stack = list(container.iter())[::-1]
+    while stack:
+        node = stack.pop()
+        if node.tag in TEXT_TAGS:
+            text = node.text(separator=" ", strip=True)
+            # Only keep non-trivial text that isn't just a single word/label
+            if len(text) > 20:
+                key = " ".join(text.split())
+                if key not in seen:
+                    seen.add(key)
+                    lines.append(text)
+            # Children's text is contained in this element's text either way
+            continue
+        stack.extend(list(node.iter())[::-1])
+    return lines
+
+
+def _get_text_from_container(container: LexborNode) -> str:
     """Extract text from a container, preferring structured elements then fallback."""
     # Try structured extraction first
-    lines = []
-    for el in container.find_all(["p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "td", "dd", "dt", "span", "div"]):
-        text = el.get_text(separator=" ", strip=True)
-        # Only keep non-trivial text that isn't just a single word/label
-        if text and len(text) > 20:
-            lines.append(text)
-
+    lines = _collect_text_blocks(container)
     if lines:
-        # Deduplicate (parent elements contain child text)
-        seen = set()
-        deduped = []
-        for line in lines:
-            # Skip if this line is a substring of something already added
-            if any(line in s for s in seen):
-                continue
-            # Remove previously added lines that are substrings of this one
-            deduped = [s for s in deduped if s not in line]
-            seen = {s for s in seen if s not in line}
-            deduped.append(line)
-            seen.add(line)
-        text = "\n\n".join(deduped)
+        text = "\n\n".join(lines)
     else:
         # Fallback: just get all text from the container
-        text = container.get_text(separator="\n", strip=True)
+        text = container.text(separator="\n", strip=True)
 
     # Clean up whitespace
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    text = re.sub(r"[ \t]+", " ", text)
+    text = _NEWLINE_RE.sub("\n\n", text)
+    text = _WS_RE.sub(" ", text)
     return text.strip()
 
 
 def extract_article_text(html: str, url: str) -> str:
     """Extract main article content from HTML, stripping boilerplate."""
-    soup = BeautifulSoup(html, "lxml")
-    soup = _clean_soup(soup)
+    tree = _clean_tree(LexborHTMLParser(html))
 
     # Try to find the main content container (site-specific first, then generic)
     container = None
 
     # Wikipedia
     if "wikipedia.org" in url:
-        container = soup.find("div", id="mw-content-text")
+        container = tree.css_first("div#mw-content-text")
 
-    # Squarespace-based sites (original-cin, comedygreenroom, comedyhistory101, partonandpearl)
-    if not container:
-        container = soup.find("div", class_=re.compile(r"sqs-block-content", re.I))
+    # Site-family and generic containers, by priority
     if not container:
-        container = soup.find("div", class_=re.compile(r"blog-item-content", re.I))
-
-    # Generic article/main patterns
-    if not container:
-        container = (
-            soup.find("article")
-            or soup.find("main")
-            or soup.find("div", {"role": "main"})
-            or soup.find("div", class_=re.compile(r"(article[_-]?body|article[_-]?content|post[_-]?content|entry[_-]?content|story[_-]?body)", re.I))
-            or soup.find("div", id=re.compile(r"(article|content|post|entry|story)", re.I))
-            or soup.find("div", class_=re.compile(r"(article|content|post|entry|story)", re.I))
-        )
+        for selector in MAIN_SELECTORS:
+            container = tree.css_first(selector)
+            if container:
+                break
 
     # Last resort: body
     if not container:
-        container = soup.body or soup
+        container = tree.body or tree.root
 
     return _get_text_from_container(container)
 
 
 # ── Fetching ───────────────────────────────────────────────────────────────────
 
-def fetch_article(name: str, url: str) -> str | None:
-    """Fetch a single URL and extract article text. Returns None on failure."""
-    try:
-        logger.info(f"Fetching: {name} -> {url}")
-        resp = requests.get(url, headers=HEADERS, timeout=20, allow_redirects=True)
-        resp.raise_for_status()
-        text = extract_article_text(resp.text, url)
-        char_count = len(text)
-        if char_count < 50:
-            logger.warning(f"  Short content ({char_count} chars) — may be JS-rendered/paywalled")
-        else:
-            logger.info(f"  Extracted {char_count:,} chars")
-        return text if char_count > 0 else None
-    except requests.RequestException as e:
-        logger.error(f"  FAILED {name}: {e}")
+def _read_if_exists(path: str) -> str | None:
+    """Return a cache file's contents, or None if it doesn't exist."""
+    if not os.path.exists(path):
         return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _save_html_cache(name: str, resp: httpx.Response) -> None:
+    """Cache a fetched page as raw/{name}.html plus its ETag / Last-Modified validators."""
+    base = os.path.join(RAW_DIR, name)
+    with open(f"{base}.html", "w", encoding="utf-8") as f:
+        f.write(resp.text)
+    for suffix, header in ((".etag", "ETag"), (".last_modified", "Last-Modified")):
+        path = base + suffix
+        value = resp.headers.get(header)
+        if value:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(value)
+        elif os.path.exists(path):
+            os.remove(path)  # stale validator from an earlier response
+
+
+async def fetch_html(client: httpx.AsyncClient, sem: asyncio.Semaphore, name: str, url: str) -> str | None:
+    """Fetch a single URL and return its HTML. Returns None on failure.
+    Sends If-None-Match / If-Modified-Since when a cached copy exists and reuses it on 304.
+    """
+    base = os.path.join(RAW_DIR, name)
+    cached_html = _read_if_exists(f"{base}.html")
+    headers = {}
+    if cached_html is not None:
+        etag = _read_if_exists(f"{base}.etag")
+        last_modified = _read_if_exists(f"{base}.last_modified")
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    async with sem:
+        try:
+            logger.info(f"Fetching: {name} -> {url}")
+            resp = await client.get(url, headers=headers)
+            if resp.status_code == 304 and cached_html is not None:
+                logger.info(f"  {name}: not modified, using cached HTML")
+                return cached_html
+            resp.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error(f"  FAILED {name}: {e}")
+            return None
+        finally:
+            await asyncio.sleep(POLITE_DELAY)  # polite delay, per host
+
+    _save_html_cache(name, resp)
+    return resp.text
+
+
+def extract_fetched(name: str, url: str, html: str) -> str | None:
+    """Extract article text from fetched HTML. Returns None if nothing was extracted."""
+    text = extract_article_text(html, url)
+    char_count = len(text)
+    if char_count < 50:
+        logger.warning(f"  {name}: short content ({char_count} chars) — may be JS-rendered/paywalled")
+    else:
+        logger.info(f"  {name}: extracted {char_count:,} chars")
+    return text if char_count > 0 else None
+
+
+async def fetch_article(client: httpx.AsyncClient, sem: asyncio.Semaphore, name: str, url: str) -> str | None:
+    """Fetch a URL and extract its article text. Returns None on failure.
+    Parsing runs in a worker thread so it overlaps with other in-flight fetches.
+    """
+    html = await fetch_html(client, sem, name, url)
+    if html is None:
+        return None
+    return await asyncio.to_thread(extract_fetched, name, url, html)
+
+
+async def fetch_all(urls: list[tuple[str, str]]) -> dict[str, str | None]:
+    """Fetch and extract all URLs concurrently, limiting concurrency per host.
+    Returns {name: text_or_None}.
+    """
+    host_sems = {
+        host: asyncio.Semaphore(HOST_CONCURRENCY)
+        for host in {urlparse(url).netloc for _, url in urls}
+    }
+    async with httpx.AsyncClient(headers=HEADERS, timeout=20, follow_redirects=True) as client:
+        texts = await asyncio.gather(*(
+            fetch_article(client, host_sems[urlparse(url).netloc], name, url)
+            for name, url in urls
+        ))
+    return {name: text for (name, _url), text in zip(urls, texts)}
 
 
 # ── Chunking ───────────────────────────────────────────────────────────────────
 
-def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[str]:
-    """Split text into chunks of ~chunk_size tokens with ~overlap token overlap."""
-    words = text.split()
-    if not words:
-        return []
+_WORD_RE = re.compile(r"\S+")
+
 
+def iter_chunks(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Iterator[str]:
+    """Yield chunks of ~chunk_size tokens with ~overlap token overlap.
+    Words are streamed through a fixed-size window; a chunk is emitted every
+    (window - overlap) words, plus one final partial window for any words left over.
+    """
     # Convert token counts to approximate word counts (~1.33 tokens per word)
     words_per_chunk = int(chunk_size / 1.33)
     words_overlap = int(overlap / 1.33)
+    stride = words_per_chunk - words_overlap
+
+    window = deque(maxlen=words_per_chunk)
+    count = 0
+    emitted = 0                 # words covered by the windows yielded so far
+    next_end = words_per_chunk  # word count at which the next full window is due
+    for match in _WORD_RE.finditer(text):
+        window.append(match.group())
+        count += 1
+        if count == next_end:
+            yield " ".join(window)
+            emitted = count
+            next_end += stride
+
+    if count > emitted:
+        # Final partial window, starting where the next full window would have
+        tail = count - max(emitted - words_overlap, 0)
+        yield " ".join(list(window)[-tail:])
 
-    chunks = []
-    start = 0
-    while start < len(words):
-        end = start + words_per_chunk
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        start = end - words_overlap
-        if start >= len(words):
-            break
 
-    return chunks
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[str]:
+    """Split text into chunks of ~chunk_size tokens with ~overlap token overlap."""
+    return list(iter_chunks(text, chunk_size, overlap))
 
 
 # ── Main pipeline ──────────────────────────────────────────────────────────────
@@ -204,13 +328,13 @@ def main():
     fetched = {}
     failed = []
 
+    texts = asyncio.run(fetch_all(URLS))
     for name, url in URLS:
-        text = fetch_article(name, url)
+        text = texts[name]
         if text:
             fetched[name] = {"url": url, "text": text}
         else:
             failed.append((name, url))
-        time.sleep(1)  # polite delay
 
     # Step 2: Save raw text files
     logger.info("=" * 60)
@@ -262,19 +386,26 @@ def main():
 
     collection = client.get_or_create_collection(
         name=COLLECTION_NAME,
-        metadata={"description": "Kenny Robinson comedy corpus"},
+        metadata={"description": "Kenny Robinson comedy corpus", **HNSW_METADATA},
     )
 
-    # Add in batches (ChromaDB handles embedding via default function)
-    BATCH_SIZE = 100
-    for i in range(0, len(all_chunks), BATCH_SIZE):
-        batch = all_chunks[i : i + BATCH_SIZE]
+    # Embed everything up front so ChromaDB skips its own per-batch embedding
+    embeddings = embed_texts([c["text"] for c in all_chunks])
+
+    # Add in batches, INSERT_WORKERS at a time. Chunk ids are fixed up front, so the
+    # stored result doesn't depend on which batch lands first.
+    def add_batch(start: int) -> None:
+        batch = all_chunks[start : start + BATCH_SIZE]
         collection.add(
             ids=[c["id"] for c in batch],
+            embeddings=embeddings[start : start + BATCH_SIZE],
             documents=[c["text"] for c in batch],
             metadatas=[c["metadata"] for c in batch],
         )
-        logger.info(f"  Added batch {i // BATCH_SIZE + 1} ({len(batch)} chunks)")
+        logger.info(f"  Added batch {start // BATCH_SIZE + 1} ({len(batch)} chunks)")
+
+    with ThreadPoolExecutor(max_workers=INSERT_WORKERS) as pool:
+        list(pool.map(add_batch, range(0, len(all_chunks), BATCH_SIZE)))
 
     # Step 5: Summary
     logger.info("=" * 60)
@@ -0,0 +1,80 @@
+"""
+Chunk embedding shared by the ingest scripts (build_vector_db.py, add_supplemental.py).
+Both write to the same content-hash cache, so the model and cache key live here, once.
+"""
+
+import os
+import hashlib
+import sqlite3
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+EMBED_MODEL = "all-MiniLM-L6-v2"  # same model ChromaDB's default embedder uses at query time
+EMBED_BATCH_SIZE = 128
+EMBED_CACHE_PATH = os.path.join(BASE_DIR, "kenny_robinson_corpus", "embedding_cache.sqlite3")
+
+
+_embedder = None
+
+
+def load_embedder():
+    """Load the sentence-transformers embedding model once, on GPU when available.
+    torch and sentence-transformers are imported here, so a full cache hit never loads them.
+    """
+    global _embedder
+    if _embedder is None:
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        logger.info(f"  Loading embedding model {EMBED_MODEL} on {device}")
+        _embedder = SentenceTransformer(EMBED_MODEL, device=device)
+    return _embedder
+
+
+def _embedding_key(text: str) -> str:
+    """Cache key: hash of the model name + whitespace-normalized chunk text."""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{EMBED_MODEL}\n{normalized}".encode("utf-8")).hexdigest()[:16]
+
+
+def embed_texts(texts: list[str]) -> list[list[float]]:
+    """Embed texts, returning normalized vectors.
+    Vectors are reused from EMBED_CACHE_PATH (shared by both ingest scripts) when the same
+    text was embedded before; only misses are encoded, in batches of EMBED_BATCH_SIZE.
+    """
+    keys = [_embedding_key(t) for t in texts]
+    vectors = {}
+    conn = sqlite3.connect(EMBED_CACHE_PATH)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        for key in set(keys):
+            row = conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row:
+                vectors[key] = np.frombuffer(row[0], dtype=np.float32)
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing:
+            encoded = load_embedder().encode(
+                list(missing.values()),
+                batch_size=EMBED_BATCH_SIZE,
+                normalize_embeddings=True,
+                show_progress_bar=True,
+            )
+            for key, vector in zip(missing, encoded):
+                vectors[key] = np.asarray(vector, dtype=np.float32)
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, vectors[key].tobytes()) for key in missing],
+            )
+            conn.commit()
+    finally:
+        conn.close()
+
+    logger.info(f"  Embeddings: {len(texts)} chunks, {len(missing)} newly computed")
+    return [vectors[key].tolist() for key in keys]
@@ -5,14 +5,25 @@ Single-process: polling mode (no webhook/SSL needed)
 
 import os
 import json
+import time
 import asyncio
+import contextlib
+import functools
+import hashlib
 import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from typing import NamedTuple
 
 import chromadb
 import httpx
+import numpy as np
+import orjson
+from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
 from fastapi import FastAPI
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.constants import ChatAction
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -30,7 +41,22 @@ ANTHROPIC_MODEL = os.environ.get("ANTHROPIC_MODEL", "claude-sonnet-4-20250514")
 CHROMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chromadb")
 COLLECTION_NAME = "kenny_robinson"
 N_RESULTS = 5
+N_CANDIDATES = N_RESULTS * 2  # over-fetch so near-duplicates can be dropped without losing recall
+MAX_CHUNK_OVERLAP = 0.6  # 5-gram Jaccard above which a candidate counts as a near-duplicate
+MAX_PROMPT_CHUNK_CHARS = 800  # per-chunk cap in the prompt, cut back to a sentence boundary
+STREAM_EDIT_INTERVAL = 0.4  # seconds between live Telegram edits while streaming
+STREAM_EDIT_MIN_CHARS = 40  # new chars needed before the first live edit...
+STREAM_EDIT_MAX_CHARS = 400  # ...growing by STREAM_EDIT_GROWTH per edit up to this
+STREAM_EDIT_GROWTH = 2.0
+STREAM_STALL_TIMEOUT = 30.0  # abort the Anthropic stream if no bytes arrive for this long
+TYPING_INTERVAL = 4.0  # Telegram shows a chat action for ~5 s, so resend a little sooner
+FLAT_SEARCH_MAX_CHUNKS = 10_000  # above this, search through Chroma's HNSW index instead
+RETRIEVAL_CACHE_SIZE = 128       # questions whose retrieval results are kept in memory
 HEALTH_PORT = int(os.environ.get("HEALTH_PORT", "8042"))
+RAG_MAX_CONCURRENCY = int(os.environ.get("RAG_MAX_CONCURRENCY", "4"))
+# Live preview edits while streaming; when off, the "typing..." indicator alone shows progress
+STREAM_EDITS = os.environ.get("STREAM_EDITS", "1").lower() not in ("0", "false", "no")
+CANNED_ANSWERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "canned_answers.json")
 
 logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
@@ -39,9 +65,164 @@ logging.basicConfig(
 logger = logging.getLogger("kenny-rag")
 
 # --- ChromaDB ---
-chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
-collection = chroma_client.get_collection(COLLECTION_NAME)
-logger.info(f"ChromaDB loaded: {collection.count()} chunks in '{COLLECTION_NAME}'")
+# Opened during startup (see lifespan) rather than at import. Every blocking retrieval call
+# (ChromaDB, query embedding, mirror scan) goes through CHROMA_EXECUTOR so a slow query never
+# stalls Telegram polling, streaming edits or /health.
+CHROMA_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="chroma")
+
+chroma_client = None
+collection = None
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking retrieval call on CHROMA_EXECUTOR and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(CHROMA_EXECUTOR, functools.partial(fn, *args, **kwargs))
+
+
+def open_chroma() -> None:
+    """Open the persistent collection, prime the stats cache, load the embedding mirror
+    and the query embedder (blocking).
+    """
+    global chroma_client, collection, mirror, _chunk_count, _source_names
+    chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
+    collection = chroma_client.get_collection(COLLECTION_NAME)
+    _chunk_count = collection.count()
+    all_meta = collection.get(include=["metadatas"])["metadatas"]
+    _source_names = {m.get("source_name", "unknown") for m in all_meta}
+    logger.info(f"ChromaDB loaded: {_chunk_count} chunks in '{COLLECTION_NAME}', {len(_source_names)} sources")
+
+    mirror = load_mirror(_chunk_count)
+    if mirror is not None:
+        logger.info(f"Embedding mirror loaded: {mirror['embeddings'].shape}")
+
+    # Build the query embedder here, on one thread: its lazy model load isn't thread-safe
+    embed_fn(["warmup"])
+
+
+# --- Query embedder ---
+class QuantizedMiniLM(ONNXMiniLM_L6_V2):
+    """Chroma's ONNX all-MiniLM-L6-v2 with INT8 weights and no fixed-length padding.
+    Query embedding is the slowest CPU step of retrieval: dynamic INT8 quantization cuts the
+    matmul cost, and padding to the longest input instead of 256 tokens skips most of the work
+    for a one-line question. Falls back to the stock fp32 model if quantization is unavailable.
+    """
+
+    @functools.cached_property
+    def tokenizer(self):
+        tokenizer = super().tokenizer
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        return tokenizer
+
+    def _forward(self, documents: list[str], batch_size: int = 32) -> np.ndarray:
+        """Chroma's mean-pooled forward pass, encoding each batch together so it pads to its
+        longest input (the stock version encodes one document at a time at a fixed length).
+        """
+        all_embeddings = []
+        for i in range(0, len(documents), batch_size):
+            encoded = self.tokenizer.encode_batch(documents[i : i + batch_size])
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            last_hidden_state = self.model.run(
+                None,
+                {
+                    "input_ids": input_ids,
+                    "attention_mask": attention_mask,
+                    "token_type_ids": np.zeros_like(input_ids),
+                },
+            )[0]
+            mask = attention_mask[..., np.newaxis].astype(np.float32)
+            embeddings = (last_hidden_state * mask).sum(1) / np.clip(mask.sum(1), 1e-9, None)
+            all_embeddings.append(self._normalize(embeddings).astype(np.float32))
+        return np.concatenate(all_embeddings)
+
+    @functools.cached_property
+    def model(self):
+        model_dir = os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME)
+        int8_path = os.path.join(model_dir, "model_int8.onnx")
+        if not os.path.exists(int8_path):
+            tmp_path = None
+            try:
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+
+                fd, tmp_path = tempfile.mkstemp(suffix=".onnx.tmp", dir=model_dir)
+                os.close(fd)
+                quantize_dynamic(os.path.join(model_dir, "model.onnx"), tmp_path, weight_type=QuantType.QInt8)
+                os.replace(tmp_path, int8_path)
+            except Exception as e:
+                logger.warning(f"INT8 quantization unavailable, using fp32 query embedder: {e}")
+                return super().model
+            finally:
+                if tmp_path and os.path.exists(tmp_path):
+                    with contextlib.suppress(OSError):
+                        os.remove(tmp_path)
+
+        try:
+            so = self.ort.SessionOptions()
+            so.log_severity_level = 3
+            so.graph_optimization_level = self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            return self.ort.InferenceSession(int8_path, providers=["CPUExecutionProvider"], sess_options=so)
+        except Exception as e:
+            # Unreadable cached file: drop it so the next start re-quantizes
+            logger.warning(f"Could not load INT8 query embedder, using fp32: {e}")
+            with contextlib.suppress(OSError):
+                os.remove(int8_path)
+            return super().model
+
+
+# --- In-memory embedding mirror ---
+# For a small corpus a flat dot-product scan over every chunk beats an HNSW + SQLite round
+# trip per query. Ingest stores normalized all-MiniLM-L6-v2 vectors, the same model as
+# Chroma's embedder, so query vectors from embed_fn are directly comparable.
+embed_fn = QuantizedMiniLM()
+mirror = None
+
+
+def load_mirror(count: int) -> dict | None:
+    """Load all chunk embeddings + documents + metadata into memory, or None if empty or too large."""
+    if count == 0 or count > FLAT_SEARCH_MAX_CHUNKS:
+        return None
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    if not data["ids"]:
+        return None
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32).reshape(len(data["ids"]), -1)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return {
+        "embeddings": embeddings,
+        "documents": data["documents"],
+        "metadatas": data["metadatas"],
+        # Report distances in the collection's own space so mirror and Chroma results agree
+        "space": (collection.metadata or {}).get("hnsw:space", "l2"),
+    }
+
+
+# --- Collection stats (the DB only changes on re-ingest + redeploy) ---
+_source_names: set[str] = set()
+_chunk_count = 0
+
+
+def get_source_names() -> set[str]:
+    """Unique source names in the collection, collected once when ChromaDB is opened."""
+    return _source_names
+
+
+def get_chunk_count() -> int:
+    """Collection chunk count, taken once when ChromaDB is opened."""
+    return _chunk_count
+
+
+# --- Anthropic HTTP client (shared so calls reuse pooled keep-alive connections) ---
+anthropic_client = httpx.AsyncClient(
+    base_url="https://api.anthropic.com",
+    headers={
+        "x-api-key": ANTHROPIC_API_KEY,
+        "anthropic-version": "2023-06-01",
+        "content-type": "application/json",
+    },
+    timeout=httpx.Timeout(60.0, connect=5.0),
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=8, max_connections=16),
+)
 
 # --- System Prompt ---
 SYSTEM_PROMPT = """You are a knowledgeable research assistant specializing in Kenny Robinson, \
@@ -67,31 +248,157 @@ Do not use markdown headers or bullet points — use dashes if listing items."""
 
 
 # --- RAG Pipeline ---
-async def retrieve_chunks(question: str) -> list[dict]:
-    """Query ChromaDB for relevant chunks."""
+class Chunk(NamedTuple):
+    """A retrieved corpus chunk and its distance to the question (lower is closer)."""
+    text: str
+    source_name: str
+    source_url: str
+    distance: float
+
+
+def _make_chunk(doc: str, meta: dict, dist: float) -> Chunk:
+    return Chunk(doc, meta.get("source_name", ""), meta.get("source_url", ""), dist)
+
+
+def embed_query(question: str) -> np.ndarray:
+    """Normalized embedding of the question, computed once per retrieval."""
+    query = np.asarray(embed_fn([question])[0], dtype=np.float32)
+    return query / np.linalg.norm(query)
+
+
+def search_mirror(query: np.ndarray) -> list[Chunk]:
+    """Flat cosine-similarity top-k over the in-memory mirror."""
+    scores = mirror["embeddings"] @ query
+    k = min(N_CANDIDATES, len(scores))
+    if k == 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    # For unit vectors squared L2 is 2 - 2cos; Chroma's cosine and ip spaces report 1 - cos
+    if mirror["space"] == "l2":
+        distances = 2.0 - 2.0 * scores[top]
+    else:
+        distances = 1.0 - scores[top]
+    return [
+        _make_chunk(mirror["documents"][i], mirror["metadatas"][i], float(d))
+        for i, d in zip(top, distances)
+    ]
+
+
+def search_collection(query: np.ndarray) -> list[Chunk]:
+    """Top-k through Chroma's index, passing the precomputed query embedding."""
     results = collection.query(
-        query_texts=[question],
-        n_results=N_RESULTS,
+        query_embeddings=[query.tolist()],
+        n_results=N_CANDIDATES,
+        include=["documents", "metadatas", "distances"],
     )
-    chunks = []
-    for doc, meta, dist in zip(
-        results["documents"][0],
-        results["metadatas"][0],
-        results["distances"][0],
-    ):
-        chunks.append({
-            "text": doc,
-            "source_name": meta.get("source_name", ""),
-            "source_url": meta.get("source_url", ""),
-            "distance": round(dist, 4),
-        })
-    return chunks
-
-
-async def generate_answer(question: str, chunks: list[dict], status_msg=None) -> str:
-    """Call Anthropic API with streaming, updating status_msg as tokens arrive."""
+    return [
+        _make_chunk(doc, meta, dist)
+        for doc, meta, dist in zip(
+            results["documents"][0],
+            results["metadatas"][0],
+            results["distances"][0],
+        )
+    ]
+
+
+def _shingles(text: str, n: int = 5) -> frozenset:
+    words = text.lower().split()
+    return frozenset(tuple(words[i : i + n]) for i in range(max(len(words) - n + 1, 1)))
+
+
+def select_diverse(candidates: list[Chunk]) -> list[Chunk]:
+    """Greedy MMR-style pick: walk candidates closest-first, dropping exact and near-duplicates."""
+    kept: list[Chunk] = []
+    kept_shingles: list[frozenset] = []
+    seen = set()
+    for c in candidates:
+        key = (c.source_name, c.text[:160].lower())
+        if key in seen:
+            continue
+        seen.add(key)
+        sh = _shingles(c.text)
+        if any(len(sh & k) / len(sh | k) > MAX_CHUNK_OVERLAP for k in kept_shingles):
+            continue
+        kept.append(c)
+        kept_shingles.append(sh)
+        if len(kept) == N_RESULTS:
+            break
+    return kept
+
+
+def trim_chunk(text: str) -> str:
+    """Cap a chunk at MAX_PROMPT_CHUNK_CHARS, ending on the last sentence boundary before it."""
+    if len(text) <= MAX_PROMPT_CHUNK_CHARS:
+        return text
+    head = text[:MAX_PROMPT_CHUNK_CHARS]
+    cut = max(head.rfind(". "), head.rfind("! "), head.rfind("? "))
+    return head[: cut + 1] if cut > 0 else head
+
+
+@functools.lru_cache(maxsize=RETRIEVAL_CACHE_SIZE)
+def search(question: str) -> tuple[Chunk, ...]:
+    """Embed the question and find its top distinct chunks (blocking).
+    Cached per question, so repeats such as the /start buttons skip embedding and search;
+    the corpus only changes on redeploy.
+    """
+    query = embed_query(question)
+    if mirror is not None:
+        candidates = search_mirror(query)
+    else:
+        candidates = search_collection(query)
+    return tuple(select_diverse(candidates))
+
+
+async def retrieve_chunks(question: str) -> list[Chunk]:
+    """Find the most relevant chunks: flat search over the mirror, or a ChromaDB query."""
+    return list(await run_blocking(search, question))
+
+
+async def iter_sse_data(resp: httpx.Response):
+    """Yield the raw `data:` payload of each SSE event, aborting if the stream stalls."""
+    chunks = resp.aiter_bytes()
+    buf = b""
+    while True:
+        try:
+            chunk = await asyncio.wait_for(anext(chunks), STREAM_STALL_TIMEOUT)
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Anthropic stream stalled for {STREAM_STALL_TIMEOUT:.0f}s")
+        buf += chunk
+        while b"\n\n" in buf:
+            event, buf = buf.split(b"\n\n", 1)
+            for line in event.split(b"\n"):
+                if line.startswith(b"data: "):
+                    yield line[6:].strip()
+
+
+def format_reply(answer: str, source_names: list[str]) -> str:
+    """Final Telegram reply: answer + source line, capped at Telegram's message limit."""
+    full_reply = answer + "\n\n📚 Sources: " + ", ".join(source_names)
+    if len(full_reply) > 4096:
+        full_reply = full_reply[:4090] + "..."
+    return full_reply
+
+
+async def stream_editor(status_msg, edit_q: asyncio.Queue):
+    """Apply live preview edits off the token loop, so a slow Telegram call never stalls the stream."""
+    while True:
+        preview = await edit_q.get()
+        try:
+            await status_msg.edit_text(preview)
+        except Exception:
+            pass  # Rate limit or same content — skip
+
+
+async def generate_answer(question: str, chunks: list[Chunk], source_names: list[str], status_msg=None) -> str:
+    """Call Anthropic API with streaming, updating status_msg as tokens arrive.
+    Returns the finished reply with its source line; status_msg, if given, is edited to it
+    as soon as the stream ends.
+    """
     context_block = "\n\n---\n\n".join(
-        f"[Source: {c['source_name']}]\n{c['text']}" for c in chunks
+        f"[Source: {c.source_name}]\n{trim_chunk(c.text)}" for c in chunks
     )
 
     user_message = f"""Context chunks (from verified sources):
@@ -100,86 +407,224 @@ async def generate_answer(question: str, chunks: list[dict], status_msg=None) ->
 
 Question: {question}"""
 
-    headers = {
-        "x-api-key": ANTHROPIC_API_KEY,
-        "anthropic-version": "2023-06-01",
-        "content-type": "application/json",
-    }
     payload = {
         "model": ANTHROPIC_MODEL,
         "max_tokens": 1024,
         "stream": True,
-        "system": SYSTEM_PROMPT,
+        # The system prompt is identical for every request, so mark it as a cacheable prefix.
+        # Anthropic only caches prefixes above the model's minimum length; below that it is a no-op.
+        "system": [
+            {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+        ],
         "messages": [{"role": "user", "content": user_message}],
     }
 
-    full_text = ""
+    parts: list[str] = []
+    parts_len = 0
     last_edit_len = 0
+    last_edit_at = time.monotonic()
+    edit_step = STREAM_EDIT_MIN_CHARS
+    edit_q: asyncio.Queue[str] = asyncio.Queue(maxsize=1)
+    editor_task = asyncio.create_task(stream_editor(status_msg, edit_q)) if status_msg and STREAM_EDITS else None
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        async with client.stream(
+    try:
+        async with anthropic_client.stream(
             "POST",
-            "https://api.anthropic.com/v1/messages",
-            headers=headers,
-            json=payload,
+            "/v1/messages",
+            content=orjson.dumps(payload),
         ) as resp:
             resp.raise_for_status()
-            async for line in resp.aiter_lines():
-                if not line.startswith("data: "):
-                    continue
-                data_str = line[6:]
-                if data_str.strip() == "[DONE]":
+            async for data in iter_sse_data(resp):
+                if data == b"[DONE]":
                     break
                 try:
-                    event = json.loads(data_str)
-                except Exception:
+                    event = orjson.loads(data)
+                except orjson.JSONDecodeError:
                     continue
 
+                if event.get("type") == "error":
+                    # Anthropic reports mid-stream failures (e.g. overloaded_error) on a 200 stream
+                    error = event.get("error", {})
+                    raise RuntimeError(f"Anthropic stream error: {error.get('type')}: {error.get('message')}")
                 if event.get("type") == "content_block_delta":
                     delta = event.get("delta", {})
                     if delta.get("type") == "text_delta":
-                        full_text += delta.get("text", "")
+                        text = delta.get("text", "")
+                        parts.append(text)
+                        parts_len += len(text)
+
+                # Edit early and often at first, then less as the answer grows, so the reply
+                # feels live without burning Telegram's edit rate limit
+                if (
+                    editor_task
+                    and parts_len - last_edit_len >= edit_step
+                    and time.monotonic() - last_edit_at >= STREAM_EDIT_INTERVAL
+                ):
+                    last_edit_at = time.monotonic()
+                    last_edit_len = parts_len
+                    edit_step = min(int(edit_step * STREAM_EDIT_GROWTH), STREAM_EDIT_MAX_CHARS)
+                    preview = "".join(parts) + " ✍️..."
+                    if len(preview) > 4096:
+                        preview = preview[:4090] + "..."
+                    # Replace any snapshot the editor hasn't picked up yet
+                    if edit_q.full():
+                        edit_q.get_nowait()
+                    edit_q.put_nowait(preview)
+    finally:
+        if editor_task:
+            # Cancelled and awaited so no preview edit can land after the caller's final edit
+            editor_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await editor_task
+
+    if not parts_len:
+        raise RuntimeError("Anthropic stream ended without any answer text")
+    reply = format_reply("".join(parts), source_names)
+    if status_msg:
+        await status_msg.edit_text(reply)
+    return reply
+
+
+# Admission control: questions beyond this many wait their turn instead of all slowing down
+RAG_SEMA = asyncio.Semaphore(RAG_MAX_CONCURRENCY)
+
+
+# --- Canned /start answers ---
+# (button label, question) for the /start keyboard. The answers only change when the corpus
+# or model does, so they are generated once and replayed on every button press.
+START_QUESTIONS = [
+    ("How did Kenny get started?", "How did Kenny get started in comedy?"),
+    ("What's the Nubian show?", "What is the Nubian Comedy Revue?"),
+    ("Who has he worked with?", "Who has Kenny Robinson worked with and mentored?"),
+    ("What awards has he won?", "What awards has Kenny Robinson won?"),
+    ("What should I watch first?", "What Kenny Robinson content should I watch first?"),
+]
 
-                # Update message every ~150 chars so it feels live
-                if status_msg and len(full_text) - last_edit_len > 150:
-                    try:
-                        preview = full_text + " ✍️..."
-                        if len(preview) > 4096:
-                            preview = preview[:4090] + "..."
-                        await status_msg.edit_text(preview)
-                        last_edit_len = len(full_text)
-                    except Exception:
-                        pass  # Rate limit or same content — skip
+canned_answers: dict[str, str] = {}
 
-    return full_text
+
+async def warm_cache():
+    """Fill canned_answers for START_QUESTIONS, reusing CANNED_ANSWERS_PATH when still valid."""
+    fingerprint = {
+        "model": ANTHROPIC_MODEL,
+        "chunk_count": get_chunk_count(),
+        "prompt": hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:16],
+    }
+    try:
+        with open(CANNED_ANSWERS_PATH, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("fingerprint") == fingerprint:
+            # A reply that is only the source line means the answer itself was empty
+            canned_answers.update(
+                (q, a) for q, a in saved.get("answers", {}).items() if not a.startswith("\n\n📚 Sources:")
+            )
+    except (OSError, ValueError):
+        pass
+
+    generated = 0
+    for _label, question in START_QUESTIONS:
+        if question in canned_answers:
+            continue
+        try:
+            async with RAG_SEMA:
+                chunks = await retrieve_chunks(question)
+                if not chunks:
+                    continue
+                source_names = sorted(set(c.source_name for c in chunks))
+                canned_answers[question] = await generate_answer(question, chunks, source_names)
+            generated += 1
+        except Exception as e:
+            logger.warning(f"Could not precompute answer for {question!r}: {e}")
+
+    if generated:
+        try:
+            with open(CANNED_ANSWERS_PATH, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": fingerprint, "answers": canned_answers}, f, ensure_ascii=False)
+        except OSError as e:
+            logger.warning(f"Could not save canned answers: {e}")
+    logger.info(f"Canned answers ready: {len(canned_answers)}/{len(START_QUESTIONS)} ({generated} generated)")
 
 
 # --- Telegram Handlers ---
+async def keep_typing(chat):
+    """Show "typing..." in the chat until cancelled."""
+    while True:
+        try:
+            await chat.send_action(ChatAction.TYPING)
+        except Exception:
+            pass  # Purely cosmetic — never fail the answer over it
+        await asyncio.sleep(TYPING_INTERVAL)
+
+
+async def answer_question(question: str, reply_to):
+    """Shared RAG flow for typed questions and buttons: retrieve → generate → reply."""
+    if RAG_SEMA.locked():
+        thinking_msg = await reply_to.reply_text("⏳ Queued — answering other questions first...")
+    else:
+        thinking_msg = None
+
+    async with RAG_SEMA:
+        # Send a placeholder so user knows we're working
+        if thinking_msg is None:
+            thinking_msg = await reply_to.reply_text("🔍 Searching Kenny Robinson research...")
+        else:
+            await thinking_msg.edit_text("🔍 Searching Kenny Robinson research...")
+
+        try:
+            chunks = await retrieve_chunks(question)
+            if not chunks:
+                await thinking_msg.edit_text(
+                    "I couldn't find any relevant information in my sources. "
+                    "Try rephrasing your question?"
+                )
+                return
+
+            # Phase 2: show we found sources, now generating
+            source_names = sorted(set(c.source_name for c in chunks))
+            await thinking_msg.edit_text(
+                f"📚 Found {len(source_names)} relevant sources. Writing answer..."
+            )
+
+            typing_task = asyncio.create_task(keep_typing(reply_to.chat))
+            try:
+                await generate_answer(question, chunks, source_names, status_msg=thinking_msg)
+            finally:
+                typing_task.cancel()
+
+        except Exception as e:
+            logger.error(f"RAG pipeline error: {e}", exc_info=True)
+            await thinking_msg.edit_text(
+                "Sorry, something went wrong processing your question. Please try again."
+            )
+
+
+def _build_start_keyboard() -> InlineKeyboardMarkup:
+    buttons = [
+        InlineKeyboardButton(label, callback_data=f"q:{question}")
+        for label, question in START_QUESTIONS
+    ]
+    buttons.append(InlineKeyboardButton("📚 Resources & Links", callback_data="cmd:sources"))
+    return InlineKeyboardMarkup([buttons[i : i + 2] for i in range(0, len(buttons), 2)])
+
+
+# /start never changes, so its keyboard and text are built once at import
+START_KEYBOARD = _build_start_keyboard()
+START_TEXT = (
+    "Hey {first_name}! 👋 I'm loaded up with research on Kenny Robinson — "
+    "the Godfather of Canadian Comedy himself.\n\n"
+    "Ask me anything about his background, career, the Nubian show, "
+    "his mentorship style, who he's worked with, or how to make the most "
+    "of this connection.\n\n"
+    "You can also use /sources to browse all the verified links.\n\n"
+    "This is a huge opportunity — what do you want to know?"
+)
+
+
 async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     first_name = update.effective_user.first_name or "there"
-    keyboard = [
-        [
-            InlineKeyboardButton("How did Kenny get started?", callback_data="q:How did Kenny get started in comedy?"),
-            InlineKeyboardButton("What's the Nubian show?", callback_data="q:What is the Nubian Comedy Revue?"),
-        ],
-        [
-            InlineKeyboardButton("Who has he worked with?", callback_data="q:Who has Kenny Robinson worked with and mentored?"),
-            InlineKeyboardButton("What awards has he won?", callback_data="q:What awards has Kenny Robinson won?"),
-        ],
-        [
-            InlineKeyboardButton("What should I watch first?", callback_data="q:What Kenny Robinson content should I watch first?"),
-            InlineKeyboardButton("📚 Resources & Links", callback_data="cmd:sources"),
-        ],
-    ]
     await update.message.reply_text(
-        f"Hey {first_name}! 👋 I'm loaded up with research on Kenny Robinson — "
-        f"the Godfather of Canadian Comedy himself.\n\n"
-        f"Ask me anything about his background, career, the Nubian show, "
-        f"his mentorship style, who he's worked with, or how to make the most "
-        f"of this connection.\n\n"
-        f"You can also use /sources to browse all the verified links.\n\n"
-        f"This is a huge opportunity — what do you want to know?",
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        START_TEXT.format(first_name=first_name),
+        reply_markup=START_KEYBOARD,
     )
 
 
@@ -195,28 +640,11 @@ async def handle_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Handle question buttons
     question = query.data.removeprefix("q:")
-    # Send a placeholder so user knows we're working
-    thinking_msg = await query.message.reply_text("🔍 Searching Kenny Robinson research...")
-    try:
-        chunks = await retrieve_chunks(question)
-        if not chunks:
-            await thinking_msg.edit_text("I couldn't find relevant info. Try rephrasing?")
-            return
-
-        source_names = sorted(set(c["source_name"] for c in chunks))
-        await thinking_msg.edit_text(
-            f"📚 Found {len(source_names)} relevant sources. Writing answer..."
-        )
+    if question in canned_answers:
+        await query.message.reply_text(canned_answers[question])
+        return
 
-        answer = await generate_answer(question, chunks, status_msg=thinking_msg)
-        source_line = "\n\n📚 Sources: " + ", ".join(source_names)
-        full_reply = answer + source_line
-        if len(full_reply) > 4096:
-            full_reply = full_reply[:4090] + "..."
-        await thinking_msg.edit_text(full_reply)
-    except Exception as e:
-        logger.error(f"Button RAG error: {e}", exc_info=True)
-        await thinking_msg.edit_text("Sorry, something went wrong. Please try again.")
+    await answer_question(question, query.message)
 
 
 async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -237,150 +665,162 @@ async def cmd_sources(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await send_resources(update.message)
 
 
+# --- Curated resources (/sources) ---
+RESOURCE_SECTIONS = [
+    (
+        "🎬 Streaming / Documentary",
+        "People of Comedy: Celebrating 30 Years of the Nubian Show\n"
+        "Crave · Dir. Darell Faria · Premiered April 9, 2025\n"
+        "Premier documentary. Features Russell Peters, Hassan Phills, Zabrina Douglas, Marc Trinidad. Must-watch.\n"
+        "▸ Available on Crave (subscription)\n\n"
+        "The Eh-List — Kenny Robinson Standup Special\n"
+        "New Metric Media (Letterkenny, Shoresy) · Signed July 2025\n"
+        "Upcoming standup special + album. In development.\n"
+        "▸ https://deadline.com/2025/07/eh-list-standup-specials-kenny-robinson-new-metric-media-1236464843/"
+    ),
+    (
+        "📺 News / Video",
+        "Comedian Kenny Robinson\n"
+        "Global News · Feb 15, 2017 · 5:02 video\n"
+        "▸ https://globalnews.ca/video/3905228/comedian-kenny-robinson"
+    ),
+    (
+        "🎙️ Podcasts & Interviews",
+        'Kenny Robinson is "elbows up" for Canadian comedians\n'
+        "CBC Q with Tom Power · April 7, 2025 · 23 min\n"
+        "Discusses 30-year Nubian legacy, Canadian vs American comics. Highly recommended.\n"
+        "▸ CBC: https://www.cbc.ca/arts/q/kenny-robinson-is-elbows-up-for-canadian-comedians-1.7503763\n"
+        "▸ Apple Podcasts: https://podcasts.apple.com/us/podcast/kenny-robinson-is-elbows-up-for-canadian-comedians/id256943801?i=1000702483131\n"
+        "▸ Spotify: https://open.spotify.com/episode/2P6XiEY5eO4CocYAyKYkQ3\n\n"
+        "Season 4, Episode 28 — Kenny Robinson\n"
+        "Ted Woloshyn Podcast · April 17, 2025\n"
+        "▸ https://www.tedwoloshyn.ca/season-4-episode-28-kenny-robinson/\n\n"
+        "Episode 88 — Kenny Robinson\n"
+        "Spreaker · In-depth career retrospective\n"
+        "▸ https://www.spreaker.com/episode/episode-88-kenny-robinson--50909181"
+    ),
+    (
+        "🎵 Comedy Albums",
+        "Kenny Robinson's Nubian Comedy Revue: The Next 25 (2020)\n"
+        "▸ https://www.amazon.com/Kenny-Robinsons-Nubian-Comedy-Revue/dp/B08FCQ9ZDL\n\n"
+        '"9 Confirmed Kills" (single track)\n'
+        "▸ https://www.amazon.com/9-Confirmed-Kills/dp/B08FCRW793"
+    ),
+    (
+        "📰 Key Articles & Profiles",
+        "Kenny Robinson — Full Biography\n"
+        "The Comedy Green Room · Essential reading\n"
+        "▸ https://www.thecomedygreenroom.com/post/kenny-robinson\n\n"
+        "40 at 40: Godfather of Canadian Comedy\n"
+        "NOW Toronto · 2021 retrospective\n"
+        "▸ https://nowtoronto.com/culture/40-at-40-kenny-robinson-godfather-of-canadian-comedy/\n\n"
+        "Kenny Robinson: comedian (Q&A)\n"
+        "Globe and Mail · Feb 2011\n"
+        "▸ https://www.theglobeandmail.com/news/toronto/kenny-robinson-comedian/article565003/\n\n"
+        "Original-Cin Chat: 30 Years of Nubian Comedy\n"
+        "Original Cin · April 2025\n"
+        "▸ https://www.original-cin.ca/posts/2025/4/8/original-cin-chat-nubian-show-founder-kenny-robinson-on-30-years-of-comedy-and-a-crave-debut\n\n"
+        "The Godfather of Comedy: 25 Years of Nubian\n"
+        "CBC Comedy · Nov 2020\n"
+        "▸ https://www.cbc.ca/comedy/the-godfather-of-comedy-kenny-robinson-celebrates-25-years-of-his-successful-nubian-comedy-revue-1.5804743\n\n"
+        "Kenny Robinson Celebrates 30 Years\n"
+        "The Caribbean Camera · April 2025\n"
+        "▸ https://thecaribbeancamera.com/kenny-robinson-nubian-show-30-years/"
+    ),
+    (
+        "🎭 TV & Film Highlights",
+        "After Hours with Kenny Robinson (2001) — Comedy Network\n"
+        "▸ https://www.imdb.com/title/tt0320809/\n\n"
+        "Comedy Now! — Kenny Robinson (2007) — CTV\n"
+        "▸ https://www.imdb.com/title/tt1434488/\n\n"
+        "Film: Repo Men, Down to Earth, New York Minute, The Third Miracle\n"
+        "▸ Full filmography: https://www.imdb.com/name/nm0732811/"
+    ),
+    (
+        "🌐 Social & Web",
+        "Official Website: https://www.kennyrobinson.com/\n"
+        "X/Twitter: https://x.com/thenubianshow\n"
+        "Wikipedia: https://en.wikipedia.org/wiki/Kenny_Robinson_(comedian)\n"
+        "IMDb: https://www.imdb.com/name/nm0732811/\n"
+        "Booking (Yuk Yuk's): https://www.funnybusiness.ca/comedians.php?standup=kenny-robinson"
+    ),
+]
+
+
+def _format_resource_message(title: str, body: str) -> str:
+    text = f"{title}\n{'─' * 30}\n\n{body}"
+    if len(text) > 4096:
+        text = text[:4090] + "..."
+    return text
+
+
+# Final message texts, built once at import; the catalog is static between deploys.
+RESOURCE_MESSAGES = [_format_resource_message(title, body) for title, body in RESOURCE_SECTIONS]
+
+
 async def send_resources(target_message):
     """Send the full curated catalog as categorized messages."""
-    sections = [
-        (
-            "🎬 Streaming / Documentary",
-            "People of Comedy: Celebrating 30 Years of the Nubian Show\n"
-            "Crave · Dir. Darell Faria · Premiered April 9, 2025\n"
-            "Premier documentary. Features Russell Peters, Hassan Phills, Zabrina Douglas, Marc Trinidad. Must-watch.\n"
-            "▸ Available on Crave (subscription)\n\n"
-            "The Eh-List — Kenny Robinson Standup Special\n"
-            "New Metric Media (Letterkenny, Shoresy) · Signed July 2025\n"
-            "Upcoming standup special + album. In development.\n"
-            "▸ https://deadline.com/2025/07/eh-list-standup-specials-kenny-robinson-new-metric-media-1236464843/"
-        ),
-        (
-            "📺 News / Video",
-            "Comedian Kenny Robinson\n"
-            "Global News · Feb 15, 2017 · 5:02 video\n"
-            "▸ https://globalnews.ca/video/3905228/comedian-kenny-robinson"
-        ),
-        (
-            "🎙️ Podcasts & Interviews",
-            'Kenny Robinson is "elbows up" for Canadian comedians\n'
-            "CBC Q with Tom Power · April 7, 2025 · 23 min\n"
-            "Discusses 30-year Nubian legacy, Canadian vs American comics. Highly recommended.\n"
-            "▸ CBC: https://www.cbc.ca/arts/q/kenny-robinson-is-elbows-up-for-canadian-comedians-1.7503763\n"
-            "▸ Apple Podcasts: https://podcasts.apple.com/us/podcast/kenny-robinson-is-elbows-up-for-canadian-comedians/id256943801?i=1000702483131\n"
-            "▸ Spotify: https://open.spotify.com/episode/2P6XiEY5eO4CocYAyKYkQ3\n\n"
-            "Season 4, Episode 28 — Kenny Robinson\n"
-            "Ted Woloshyn Podcast · April 17, 2025\n"
-            "▸ https://www.tedwoloshyn.ca/season-4-episode-28-kenny-robinson/\n\n"
-            "Episode 88 — Kenny Robinson\n"
-            "Spreaker · In-depth career retrospective\n"
-            "▸ https://www.spreaker.com/episode/episode-88-kenny-robinson--50909181"
-        ),
-        (
-            "🎵 Comedy Albums",
-            "Kenny Robinson's Nubian Comedy Revue: The Next 25 (2020)\n"
-            "▸ https://www.amazon.com/Kenny-Robinsons-Nubian-Comedy-Revue/dp/B08FCQ9ZDL\n\n"
-            '"9 Confirmed Kills" (single track)\n'
-            "▸ https://www.amazon.com/9-Confirmed-Kills/dp/B08FCRW793"
-        ),
-        (
-            "📰 Key Articles & Profiles",
-            "Kenny Robinson — Full Biography\n"
-            "The Comedy Green Room · Essential reading\n"
-            "▸ https://www.thecomedygreenroom.com/post/kenny-robinson\n\n"
-            "40 at 40: Godfather of Canadian Comedy\n"
-            "NOW Toronto · 2021 retrospective\n"
-            "▸ https://nowtoronto.com/culture/40-at-40-kenny-robinson-godfather-of-canadian-comedy/\n\n"
-            "Kenny Robinson: comedian (Q&A)\n"
-            "Globe and Mail · Feb 2011\n"
-            "▸ https://www.theglobeandmail.com/news/toronto/kenny-robinson-comedian/article565003/\n\n"
-            "Original-Cin Chat: 30 Years of Nubian Comedy\n"
-            "Original Cin · April 2025\n"
-            "▸ https://www.original-cin.ca/posts/2025/4/8/original-cin-chat-nubian-show-founder-kenny-robinson-on-30-years-of-comedy-and-a-crave-debut\n\n"
-            "The Godfather of Comedy: 25 Years of Nubian\n"
-            "CBC Comedy · Nov 2020\n"
-            "▸ https://www.cbc.ca/comedy/the-godfather-of-comedy-kenny-robinson-celebrates-25-years-of-his-successful-nubian-comedy-revue-1.5804743\n\n"
-            "Kenny Robinson Celebrates 30 Years\n"
-            "The Caribbean Camera · April 2025\n"
-            "▸ https://thecaribbeancamera.com/kenny-robinson-nubian-show-30-years/"
-        ),
-        (
-            "🎭 TV & Film Highlights",
-            "After Hours with Kenny Robinson (2001) — Comedy Network\n"
-            "▸ https://www.imdb.com/title/tt0320809/\n\n"
-            "Comedy Now! — Kenny Robinson (2007) — CTV\n"
-            "▸ https://www.imdb.com/title/tt1434488/\n\n"
-            "Film: Repo Men, Down to Earth, New York Minute, The Third Miracle\n"
-            "▸ Full filmography: https://www.imdb.com/name/nm0732811/"
-        ),
-        (
-            "🌐 Social & Web",
-            "Official Website: https://www.kennyrobinson.com/\n"
-            "X/Twitter: https://x.com/thenubianshow\n"
-            "Wikipedia: https://en.wikipedia.org/wiki/Kenny_Robinson_(comedian)\n"
-            "IMDb: https://www.imdb.com/name/nm0732811/\n"
-            "Booking (Yuk Yuk's): https://www.funnybusiness.ca/comedians.php?standup=kenny-robinson"
-        ),
-    ]
-
-    for title, body in sections:
-        text = f"{title}\n{'─' * 30}\n\n{body}"
-        if len(text) > 4096:
-            text = text[:4090] + "..."
+    # Sent one at a time on purpose: concurrent sends would arrive in arbitrary order
+    for text in RESOURCE_MESSAGES:
         await target_message.reply_text(text, disable_web_page_preview=True)
 
 
 async def cmd_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    count = collection.count()
-    all_meta = collection.get(include=["metadatas"])["metadatas"]
-    sources = set(m.get("source_name", "unknown") for m in all_meta)
     await update.message.reply_text(
-        f"Chunks: {count}\n"
-        f"Sources: {len(sources)}\n"
+        f"Chunks: {get_chunk_count()}\n"
+        f"Sources: {len(get_source_names())}\n"
         f"Model: {ANTHROPIC_MODEL}"
     )
 
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Main RAG flow: retrieve → generate → reply."""
+    """Answer free-text questions through the RAG flow."""
     question = update.message.text.strip()
     if not question:
         return
 
-    # Send a placeholder so user knows we're working
-    thinking_msg = await update.message.reply_text("🔍 Searching Kenny Robinson research...")
-
-    try:
-        chunks = await retrieve_chunks(question)
-        if not chunks:
-            await thinking_msg.edit_text(
-                "I couldn't find any relevant information in my sources. "
-                "Try rephrasing your question?"
-            )
-            return
-
-        # Phase 2: show we found sources, now generating
-        source_names = sorted(set(c["source_name"] for c in chunks))
-        await thinking_msg.edit_text(
-            f"📚 Found {len(source_names)} relevant sources. Writing answer..."
-        )
-
-        answer = await generate_answer(question, chunks, status_msg=thinking_msg)
-
-        source_line = "\n\n📚 Sources: " + ", ".join(source_names)
-        full_reply = answer + source_line
-        if len(full_reply) > 4096:
-            full_reply = full_reply[:4090] + "..."
+    await answer_question(question, update.message)
 
-        await thinking_msg.edit_text(full_reply)
 
-    except Exception as e:
-        logger.error(f"RAG pipeline error: {e}", exc_info=True)
-        await thinking_msg.edit_text(
-            "Sorry, something went wrong processing your question. Please try again."
-        )
+# --- Telegram Bot ---
+def build_bot() -> Application:
+    """Build the Telegram application with all handlers registered."""
+    # Updates run concurrently so one slow answer doesn't block the chat; RAG_SEMA bounds the load
+    bot = Application.builder().token(TELEGRAM_BOT_TOKEN).concurrent_updates(True).build()
+    bot.add_handler(CommandHandler("start", cmd_start))
+    bot.add_handler(CommandHandler("help", cmd_help))
+    bot.add_handler(CommandHandler("sources", cmd_sources))
+    bot.add_handler(CommandHandler("stats", cmd_stats))
+    bot.add_handler(CallbackQueryHandler(handle_button))
+    bot.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    return bot
 
 
 # --- FastAPI Health Server ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    yield
+    """Open ChromaDB, then run Telegram polling for as long as the health server is up."""
+    await run_blocking(open_chroma)
+    bot = build_bot()
+    warm_task = None
+
+    try:
+        logger.info("Starting Kenny RAG bot (polling mode)...")
+        await bot.initialize()
+        await bot.start()
+        await bot.updater.start_polling(drop_pending_updates=True)
+        warm_task = asyncio.create_task(warm_cache())
+        yield
+    finally:
+        if warm_task is not None:
+            warm_task.cancel()
+        if bot.updater.running:
+            await bot.updater.stop()
+        if bot.running:
+            await bot.stop()
+        await bot.shutdown()
+        await anthropic_client.aclose()
+        CHROMA_EXECUTOR.shutdown(wait=False)
 
 health_app = FastAPI(title="Kenny RAG Health", lifespan=lifespan)
 
@@ -389,41 +829,23 @@ health_app = FastAPI(title="Kenny RAG Health", lifespan=lifespan)
 async def health():
     return {
         "status": "ok",
-        "collection_count": collection.count(),
+        "collection_count": get_chunk_count(),
         "model": ANTHROPIC_MODEL,
     }
 
 
 # --- Entrypoint ---
 async def main():
-    """Run Telegram bot (polling) + FastAPI health server concurrently."""
-    # Build Telegram bot
-    app = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-    app.add_handler(CommandHandler("start", cmd_start))
-    app.add_handler(CommandHandler("help", cmd_help))
-    app.add_handler(CommandHandler("sources", cmd_sources))
-    app.add_handler(CommandHandler("stats", cmd_stats))
-    app.add_handler(CallbackQueryHandler(handle_button))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-
-    logger.info("Starting Kenny RAG bot (polling mode)...")
-
-    # Start bot polling
-    await app.initialize()
-    await app.start()
-    await app.updater.start_polling(drop_pending_updates=True)
-
-    # Start health server
+    """Run the FastAPI health server; its lifespan runs the Telegram bot (polling) alongside."""
     config = uvicorn.Config(health_app, host="0.0.0.0", port=HEALTH_PORT, log_level="warning")
     server = uvicorn.Server(config)
-
-    try:
-        await server.serve()
-    finally:
-        await app.updater.stop()
-        await app.stop()
-        await app.shutdown()
+    await server.serve()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        import uvloop
+    except ImportError:  # not available on Windows (run.bat)
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
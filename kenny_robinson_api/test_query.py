@@ -1,21 +1,18 @@
-"""Quick test script for the Kenny Robinson RAG API."""
+"""Quick test script for the Kenny Robinson RAG API.
+Queries run concurrently over one keep-alive client, so total time is the slowest query, not the sum.
+"""
 
 import sys
 import io
 import json
-import requests
+import asyncio
+
+import httpx
 
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", errors="replace")
 
 BASE = "http://localhost:8042"
 
-# Test 1: Health
-print("=" * 50)
-print("TEST: /health")
-r = requests.get(f"{BASE}/health")
-print(json.dumps(r.json(), indent=2))
-
-# Test 2: Query
 queries = [
     "How did Russell Peters get discovered?",
     "What films has Kenny Robinson appeared in?",
@@ -24,11 +21,38 @@ queries = [
     "What is the People of Comedy documentary?",
 ]
 
-for q in queries:
-    print("=" * 50)
-    print(f"QUERY: {q}")
-    r = requests.post(f"{BASE}/query", json={"question": q, "n_results": 5})
-    data = r.json()
-    for c in data["chunks"]:
-        print(f"  [{c['source_name']}] dist={c['distance']:.4f} | {c['text'][:100]}...")
-    print()
+
+async def main():
+    async with httpx.AsyncClient(base_url=BASE, timeout=120.0) as client:
+        # Test 1: Health
+        print("=" * 50)
+        print("TEST: /health")
+        r = await client.get("/health")
+        print(json.dumps(r.json(), indent=2))
+
+        # Test 2: Query, all at once
+        results = await asyncio.gather(
+            *(client.post("/query", json={"question": q, "n_results": 5}) for q in queries),
+            return_exceptions=True,
+        )
+
+    for q, r in zip(queries, results):
+        print("=" * 50)
+        print(f"QUERY: {q}")
+        if isinstance(r, Exception):
+            print(f"  request failed: {r!r}")
+        elif r.status_code == 404:
+            print("  /query is not served by this build (the bot only exposes /health)")
+        else:
+            for c in r.json()["chunks"]:
+                print(f"  [{c['source_name']}] dist={c['distance']:.4f} | {c['text'][:100]}...")
+        print()
+
+
+if __name__ == "__main__":
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())